@@ -1,10 +1,18 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, single worker assumed
+    fcntl = None
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+SCHEMA_LOCK_PATH = os.getenv("SCHEMA_LOCK_PATH", "./.schema.lock")
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {},
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -16,3 +24,43 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def _add_missing_columns():
+    """
+    Minimal migration: create_all() never alters existing tables, so add any model column
+    missing from the database (all columns added after the first release are nullable).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+def init_db():
+    """
+    Creates missing tables and columns. Runs under an exclusive file lock so that
+    several workers starting at once don't race on the schema.
+    """
+    from . import models # Registers the tables on Base.metadata
+
+    with open(SCHEMA_LOCK_PATH, "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            Base.metadata.create_all(bind=engine)
+            _add_missing_columns()
+            if engine.dialect.name == "sqlite":
+                # WAL lets readers (status polling) proceed while a worker writes
+                with engine.connect() as conn:
+                    conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def warm_pool():
+    """Opens (and returns to the pool) a connection so the first request doesn't pay for it."""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
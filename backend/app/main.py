@@ -1,16 +1,71 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .database import engine, Base
-from .routers import auth, repos, analyses
+from fastapi.responses import JSONResponse, PlainTextResponse
+from . import database
+from .routers import auth, repos, analyses, batches
+from .services import metrics, workspace, github_fetcher, ollama_client, pdf_generator
 
-# Create Tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Github Repo Analyzer")
+# Import the PDF stack in the background once the worker is ready (set to 0 to keep it fully lazy)
+PRELOAD_PDF = os.getenv("PRELOAD_PDF", "1") == "1"
+
+async def _preload_pdf():
+    try:
+        await asyncio.to_thread(pdf_generator.preload)
+        app.state.pdf_ready = True
+    except Exception:
+        logger.exception("PDF stack preload failed, it will be imported on first use")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.pdf_ready = False
+
+    # Create tables / add missing columns, once across all workers (file lock)
+    await asyncio.to_thread(database.init_db)
+
+    # Shared resources, created now instead of on the first request
+    await asyncio.to_thread(database.warm_pool)
+    github_fetcher.get_client()
+    ollama_client.get_client()
+
+    background = [asyncio.create_task(workspace.run_sweeper())]
+    if PRELOAD_PDF:
+        background.append(asyncio.create_task(_preload_pdf()))
+
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        for task in background:
+            task.cancel()
+        await github_fetcher.close_client()
+        await ollama_client.close_client()
+        database.engine.dispose()
+
+app = FastAPI(title="Github Repo Analyzer", lifespan=lifespan)
 
 app.include_router(auth.router)
 app.include_router(repos.router)
 app.include_router(analyses.router)
+app.include_router(batches.router)
 
 @app.get("/")
 def read_root():
     return {"message": "API is running"}
+
+@app.get("/ready")
+def read_ready():
+    """Readiness probe: 200 once startup finished (schema, pools), 503 before and during shutdown."""
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready", "pdf_preloaded": app.state.pdf_ready}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render_latest(), media_type="text/plain; version=0.0.4")
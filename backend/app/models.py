@@ -20,6 +20,7 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     repositories = relationship("Repository", back_populates="owner")
+    batches = relationship("AnalysisBatch", back_populates="owner")
 
 class Repository(Base):
     __tablename__ = "repositories"
@@ -33,18 +34,33 @@ class Repository(Base):
     owner = relationship("User", back_populates="repositories")
     jobs = relationship("AnalysisJob", back_populates="repository")
 
+class AnalysisBatch(Base):
+    __tablename__ = "analysis_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    owner = relationship("User", back_populates="batches")
+    jobs = relationship("AnalysisJob", back_populates="batch")
+
 class AnalysisJob(Base):
     __tablename__ = "analysis_jobs"
 
     id = Column(Integer, primary_key=True, index=True)
     repository_id = Column(Integer, ForeignKey("repositories.id"))
+    batch_id = Column(Integer, ForeignKey("analysis_batches.id"), nullable=True, index=True)
     status = Column(SqlEnum(JobStatus), default=JobStatus.PENDING)
     evidence_json = Column(Text, nullable=True) # Storing JSON as text for SQLite simplicity
+    metrics_json = Column(Text, nullable=True) # Stage timings and token counts, see services/metrics.py
     error_message = Column(Text, nullable=True)
+    commit_sha = Column(String, nullable=True) # Resolved HEAD commit that was analyzed
+    coalesced_with_id = Column(Integer, ForeignKey("analysis_jobs.id"), nullable=True) # Leader job this one shared results with
     created_at = Column(DateTime, default=datetime.utcnow)
     finished_at = Column(DateTime, nullable=True)
 
     repository = relationship("Repository", back_populates="jobs")
+    batch = relationship("AnalysisBatch", back_populates="jobs")
     documents = relationship("Document", back_populates="job")
 
 class Document(Base):
@@ -1,55 +1,129 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List
+import asyncio
 import json
+import logging
 import os
+import tempfile
+import time
 from .. import models, schemas, database
 from .auth import get_current_user
-from ..services import github_fetcher, context_builder, ollama_client, doc_generator
+from ..services import github_fetcher, context_builder, ollama_client, doc_generator, metrics, singleflight, workspace
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/analyses", tags=["analyses"])
 
-async def run_analysis_pipeline(job_id: int, repo_url: str, db: Session):
-    # This function runs in the background
+def _commit(db: Session):
+    with metrics.span("db_commit"):
+        db.commit()
+
+# Analyses currently running in this process, keyed by (full_name, commit)
+inflight = singleflight.SingleFlight()
+
+async def _analyze(job: models.AnalysisJob, repo_url: str, ref: str, db: Session, flow: str):
+    """Downloads, indexes and documents the repository. Returns (evidence, markdown)."""
+    # The extracted repo is only needed until the evidence is built
+    async with workspace.job_workspace(job.id) as workdir:
+        # 2. Fetch Repo
+        with metrics.span("fetch_repo_zip"):
+            repo_path = await github_fetcher.fetch_repo_zip(repo_url, workdir, ref=ref)
+
+        # 3. Build Evidence
+        with metrics.span("build_context"):
+            # Walking, sampling and indexing the files is blocking work; keep it off the event loop
+            evidence = await asyncio.to_thread(context_builder.build_context, repo_path, doc_generator.SECTION_QUERIES)
+
+    # Save evidence to DB (optional, good for debugging)
+    job.evidence_json = json.dumps(evidence)
+    _commit(db)
+
+    # 4. Call LLM
+    with metrics.span("generate_documentation"):
+        markdown_doc = await doc_generator.generate_documentation(evidence, flow=flow)
+
+    return evidence, markdown_doc
+
+async def run_analysis_pipeline(job_id: int, repo_url: str, db: Session, flow: str = None):
+    # This function runs in the background. The caller counted the job as outstanding
+    # (scheduler.job_started) when it accepted it; it stops counting once we finish.
+    try:
+        await _run_pipeline(job_id, repo_url, db, flow or f"job:{job_id}")
+    finally:
+        ollama_client.scheduler.job_finished()
+
+async def _run_pipeline(job_id: int, repo_url: str, db: Session, flow: str):
     # 1. Update status to RUNNING
     job = db.query(models.AnalysisJob).filter(models.AnalysisJob.id == job_id).first()
     if not job:
         return
-    job.status = models.JobStatus.RUNNING
-    db.commit()
 
-    try:
-        # 2. Fetch Repo
-        repo_path = await github_fetcher.fetch_repo_zip(repo_url, str(job_id))
-        
-        # 3. Build Evidence
-        evidence = context_builder.build_context(repo_path)
-        
-        # Save evidence to DB (optional, good for debugging)
-        job.evidence_json = json.dumps(evidence)
-        db.commit()
-        
-        # 4. Call LLM (Sprint 3)
-        # Note: We haven't implemented ollama_client/doc_generator yet, so we'll mock or leave TODO
-        markdown_doc = await doc_generator.generate_documentation(evidence)
-        
-        # 5. Save Document
-        doc = models.Document(
-            job_id=job.id,
-            content_md=markdown_doc
+    with metrics.track_job(job_id) as job_metrics, metrics.span("pipeline"):
+        job.status = models.JobStatus.RUNNING
+        _commit(db)
+
+        try:
+            full_name = github_fetcher.parse_repo_full_name(repo_url)
+            with metrics.span("resolve_commit"):
+                commit_sha = await github_fetcher.resolve_commit(full_name)
+            job.commit_sha = commit_sha
+            key = (full_name.lower(), commit_sha or "HEAD")
+
+            flight = inflight.get(key)
+            if flight is None:
+                evidence, markdown_doc = await inflight.run(
+                    key, job_id, lambda: _analyze(job, repo_url, commit_sha or "HEAD", db, flow)
+                )
+            else:
+                # The same repository and commit is already being analyzed: share its result
+                # instead of downloading, indexing and prompting the LLM a second time.
+                job.coalesced_with_id = flight.leader_id
+                _commit(db)
+                metrics.JOBS_COALESCED.inc()
+                with metrics.span("coalesced_wait"):
+                    try:
+                        evidence, markdown_doc = await flight.result()
+                    except Exception as e:
+                        raise RuntimeError(f"Coalesced analysis #{flight.leader_id} failed: {e}") from e
+                job.evidence_json = json.dumps(evidence)
+
+            # 5. Save Document
+            doc = models.Document(
+                job_id=job.id,
+                content_md=markdown_doc
+            )
+            db.add(doc)
+
+            # 6. Mark DONE
+            job.status = models.JobStatus.DONE
+            job.finished_at = models.datetime.utcnow()
+            job.metrics_json = json.dumps(job_metrics)
+            _commit(db)
+
+        except Exception as e:
+            db.rollback()
+            job.status = models.JobStatus.ERROR
+            job.error_message = str(e)
+            job.metrics_json = json.dumps(job_metrics)
+            db.commit()
+            logger.exception("Job %s failed: %s", job_id, e)
+
+    metrics.JOBS_TOTAL.inc(status=job.status.value)
+
+def ensure_llm_capacity(new_jobs: int = 1):
+    """
+    Rejects new work with 429 while the outstanding jobs leave no room for `new_jobs`
+    more. Jobs already accepted are never rejected, they wait.
+    """
+    if ollama_client.scheduler.is_saturated(new_jobs):
+        retry_after = ollama_client.scheduler.retry_after()
+        metrics.LLM_REJECTED.inc(reason="api")
+        raise HTTPException(
+            status_code=429,
+            detail="The analysis queue is full, please retry later",
+            headers={"Retry-After": str(retry_after)},
         )
-        db.add(doc)
-        
-        # 6. Mark DONE
-        job.status = models.JobStatus.DONE
-        job.finished_at = models.datetime.utcnow()
-        db.commit()
-        
-    except Exception as e:
-        job.status = models.JobStatus.ERROR
-        job.error_message = str(e)
-        db.commit()
-        print(f"Job {job_id} failed: {e}")
 
 @router.post("/", response_model=schemas.JobResponse)
 def start_analysis(
@@ -61,12 +135,15 @@ def start_analysis(
     repo = db.query(models.Repository).filter(models.Repository.id == repository_id).first()
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
+
+    ensure_llm_capacity()
         
     # Create Job
     job = models.AnalysisJob(repository_id=repo.id)
     db.add(job)
     db.commit()
     db.refresh(job)
+    ollama_client.scheduler.job_started()
     
     # Trigger Background Task
     background_tasks.add_task(run_analysis_pipeline, job.id, repo.url, db)
@@ -80,6 +157,15 @@ def get_analysis_status(id: int, db: Session = Depends(database.get_db), current
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
+@router.get("/{id}/metrics")
+def get_analysis_metrics(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
+    job = db.query(models.AnalysisJob).filter(models.AnalysisJob.id == id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.metrics_json:
+        return {"job_id": job.id, "stages": {}}
+    return json.loads(job.metrics_json)
+
 @router.get("/{id}/document")
 def get_analysis_document(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
     # Check job ownership via repo (simplified)
@@ -99,14 +185,27 @@ def download_pdf(id: int, db: Session = Depends(database.get_db), current_user:
     doc = job.documents[0]
     md_content = doc.content_md
     
-    # Define PDF path
+    # Define PDF path (storage/docs is a cache; the sweeper evicts old reports)
     pdf_filename = f"report_{id}.pdf"
-    pdf_path = os.path.join("storage/docs", pdf_filename)
-    os.makedirs("storage/docs", exist_ok=True)
+    pdf_path = workspace.doc_path(pdf_filename)
     
-    # Convert if not exists (or always overwrite for simplicity)
-    from ..services.pdf_generator import convert_md_to_pdf
-    convert_md_to_pdf(md_content, pdf_path)
+    # Convert if not exists: a job's document never changes once written
+    if os.path.exists(pdf_path):
+        workspace.touch(pdf_path)
+    else:
+        from ..services.pdf_generator import convert_md_to_pdf
+        start = time.perf_counter()
+        # Unique temp file per request, renamed into place: a concurrent request never
+        # serves or overwrites a half-written PDF
+        fd, tmp_path = tempfile.mkstemp(dir=workspace.DOCS_DIR, suffix=".tmp")
+        os.close(fd)
+        try:
+            convert_md_to_pdf(md_content, tmp_path)
+            os.replace(tmp_path, pdf_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        metrics.PDF_RENDER_SECONDS.observe(time.perf_counter() - start)
     
     from fastapi.responses import FileResponse
     return FileResponse(pdf_path, media_type='application/pdf', filename=pdf_filename)
@@ -0,0 +1,140 @@
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List
+import asyncio
+import os
+from .. import models, schemas, database
+from .auth import get_current_user
+from .analyses import run_analysis_pipeline, ensure_llm_capacity
+from ..services import ollama_client
+from ..services.github_fetcher import parse_repo_full_name
+
+router = APIRouter(prefix="/batches", tags=["batches"])
+
+MAX_BATCH_SIZE = 500
+
+# Max analyses from one account's batches running at the same time,
+# so onboarding a whole organization cannot monopolize the workers.
+BATCH_FANOUT_LIMIT = int(os.getenv("BATCH_FANOUT_LIMIT", "4"))
+
+_fanout = {}
+
+def _fanout_for(user_id: int) -> asyncio.Semaphore:
+    if user_id not in _fanout:
+        _fanout[user_id] = asyncio.Semaphore(BATCH_FANOUT_LIMIT)
+    return _fanout[user_id]
+
+async def run_batch(user_id: int, jobs: list):
+    """
+    Runs every (job_id, repo_url) of a batch, at most BATCH_FANOUT_LIMIT at a time per user.
+    Each job gets its own session. All of a user's batch jobs share one LLM fair-share
+    flow, so a large batch gets the same share of Ollama as a single job of someone else.
+    """
+    fanout = _fanout_for(user_id)
+
+    async def run_one(job_id: int, repo_url: str):
+        async with fanout:
+            # Batch jobs count as outstanding LLM work once they pass the fan-out limit
+            ollama_client.scheduler.job_started()
+            db = database.SessionLocal()
+            try:
+                await run_analysis_pipeline(job_id, repo_url, db, flow=f"user:{user_id}")
+            finally:
+                db.close()
+
+    await asyncio.gather(*(run_one(job_id, url) for job_id, url in jobs))
+
+def _batch_progress(db: Session, batch: models.AnalysisBatch, **extra) -> schemas.BatchResponse:
+    counts = dict(
+        db.query(models.AnalysisJob.status, func.count(models.AnalysisJob.id))
+        .filter(models.AnalysisJob.batch_id == batch.id)
+        .group_by(models.AnalysisJob.status)
+        .all()
+    )
+    return schemas.BatchResponse(
+        id=batch.id,
+        created_at=batch.created_at,
+        total=sum(counts.values()),
+        pending=counts.get(models.JobStatus.PENDING, 0),
+        running=counts.get(models.JobStatus.RUNNING, 0),
+        done=counts.get(models.JobStatus.DONE, 0),
+        error=counts.get(models.JobStatus.ERROR, 0),
+        **extra
+    )
+
+def _get_user_batch(id: int, db: Session, current_user: models.User) -> models.AnalysisBatch:
+    batch = db.query(models.AnalysisBatch).filter(
+        models.AnalysisBatch.id == id, models.AnalysisBatch.user_id == current_user.id
+    ).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@router.post("/", response_model=schemas.BatchResponse)
+def create_batch(
+    batch_in: schemas.BatchCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    if not batch_in.urls:
+        raise HTTPException(status_code=400, detail="No repository URLs provided")
+    if len(batch_in.urls) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch accepts at most {MAX_BATCH_SIZE} URLs")
+    # The batch adds at most BATCH_FANOUT_LIMIT jobs to the LLM load at any time
+    ensure_llm_capacity(min(len(batch_in.urls), BATCH_FANOUT_LIMIT))
+
+    # Normalize and deduplicate within the request, keeping submission order
+    full_names = []
+    invalid_urls = []
+    for url in batch_in.urls:
+        full_name = parse_repo_full_name(url)
+        if not full_name:
+            invalid_urls.append(url)
+        elif full_name not in full_names:
+            full_names.append(full_name)
+
+    if not full_names:
+        raise HTTPException(status_code=400, detail="Invalid GitHub URL or identifiers")
+
+    # Deduplicate against the repositories this user already registered
+    # (case-insensitive: rows created before names were lowercased keep their case)
+    existing = db.query(models.Repository).filter(
+        models.Repository.user_id == current_user.id,
+        func.lower(models.Repository.full_name).in_(full_names)
+    ).all()
+    repos_by_name = {r.full_name.lower(): r for r in existing}
+
+    new_repos = [
+        models.Repository(user_id=current_user.id, full_name=name, url=f"https://github.com/{name}")
+        for name in full_names if name not in repos_by_name
+    ]
+    db.add_all(new_repos)
+    for repo in new_repos:
+        repos_by_name[repo.full_name] = repo
+
+    batch = models.AnalysisBatch(user_id=current_user.id)
+    db.add(batch)
+    db.flush() # Assign ids so jobs can reference them, all in one transaction
+
+    jobs = [models.AnalysisJob(repository_id=repos_by_name[name].id, batch_id=batch.id) for name in full_names]
+    db.add_all(jobs)
+    db.flush()
+    # Capture before commit expires the instances (avoids one SELECT per job)
+    work = [(job.id, repos_by_name[name].url) for job, name in zip(jobs, full_names)]
+    db.commit()
+
+    background_tasks.add_task(run_batch, current_user.id, work)
+
+    return _batch_progress(db, batch, repositories_created=len(new_repos), invalid_urls=invalid_urls)
+
+@router.get("/{id}", response_model=schemas.BatchResponse)
+def get_batch_status(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
+    batch = _get_user_batch(id, db, current_user)
+    return _batch_progress(db, batch)
+
+@router.get("/{id}/jobs", response_model=List[schemas.JobResponse])
+def get_batch_jobs(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
+    batch = _get_user_batch(id, db, current_user)
+    return batch.jobs
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas, database
 from .auth import get_current_user
+from ..services.github_fetcher import parse_repo_full_name
 
 router = APIRouter(prefix="/repos", tags=["repos"])
 
@@ -11,17 +12,10 @@ def create_repository(repo: schemas.RepositoryCreate, db: Session = Depends(data
     # Basic validation (assume it's a valid github url for MVP)
     # Extract name from URL (simple logic)
     # expected format: https://github.com/owner/repo or just owner/repo
-    url = repo.url.strip()
-    if "github.com/" in url:
-        parts = url.split("github.com/")[-1].split("/")
-    else:
-        parts = url.split("/")
-    
-    if len(parts) < 2:
+    full_name = parse_repo_full_name(repo.url)
+    if not full_name:
         raise HTTPException(status_code=400, detail="Invalid GitHub URL or identifiers")
     
-    full_name = f"{parts[0]}/{parts[1]}".replace(".git", "")
-    
     new_repo = models.Repository(
         user_id=current_user.id,
         full_name=full_name,
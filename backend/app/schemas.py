@@ -26,6 +26,9 @@ class JobResponse(BaseModel):
     status: JobStatus
     created_at: datetime
     error_message: Optional[str] = None
+    batch_id: Optional[int] = None
+    commit_sha: Optional[str] = None
+    coalesced_with_id: Optional[int] = None
     class Config:
         orm_mode = True
 
@@ -40,3 +43,17 @@ class RepositoryResponse(BaseModel):
     jobs: List[JobResponse] = []
     class Config:
         orm_mode = True
+
+class BatchCreate(BaseModel):
+    urls: List[str]
+
+class BatchResponse(BaseModel):
+    id: int
+    created_at: datetime
+    total: int
+    pending: int
+    running: int
+    done: int
+    error: int
+    repositories_created: int = 0
+    invalid_urls: List[str] = []
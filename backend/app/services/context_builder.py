@@ -1,13 +1,31 @@
 import os
 import json
-from .repo_indexer import index_repo, read_file_content
+from .repo_indexer import index_repo, read_files_content, sample_files
+from . import metrics, retrieval
 
-def build_context(repo_path: str):
+# Files that go into the retrieval index (besides the key files, which are always shown)
+SOURCE_EXTENSIONS = {
+    ".py", ".js", ".jsx", ".ts", ".tsx", ".java", ".kt", ".go", ".rs", ".rb", ".php",
+    ".cs", ".scala", ".swift", ".c", ".cc", ".cpp", ".h", ".hpp", ".sql", ".sh",
+    ".yml", ".yaml", ".toml", ".ini", ".cfg", ".gradle", ".tf",
+}
+MAX_RETRIEVAL_FILES = 1500
+RETRIEVAL_FILE_BYTES = 64 * 1024
+RETRIEVAL_TOP_K = 4
+
+def build_context(repo_path: str, section_queries: dict = None):
     """
     Aggregates repo structure, key file contents, and statistics into a single JSON object.
     This JSON will be the 'Evidence Package' for the LLM.
+    Blocking (file I/O and indexing): call it from a worker thread in async code.
+
+    Source files are also chunked into a BM25 index; for each {section: query} in
+    `section_queries` the top chunks are stored under evidence["section_evidence"][section],
+    so each documentation section is prompted with the code relevant to it.
     """
     index_data = index_repo(repo_path)
+    metrics.FILES_INDEXED.inc(index_data["stats"]["files"])
+    metrics.record("files_indexed", index_data["stats"]["files"])
     
     evidence = {
         "structure": index_data["tree"][:300], # Limit tree size
@@ -15,21 +33,39 @@ def build_context(repo_path: str):
         "files_content": {}
     }
     
-    # Read content of key files
-    # Prioritize README, then manifests, then maybe source code entry points
-    prioritized_files = index_data["key_files"]
-    
-    # Also look for 'main.py' or 'index.js' if not in key files
-    common_entry_points = ["main.py", "app.py", "index.js", "server.js", "manage.py"]
-    for f in index_data["tree"]:
-        if os.path.basename(f) in common_entry_points:
-            prioritized_files.append(f)
-            
-    # Remove duplicates
-    prioritized_files = list(set(prioritized_files))
-    
-    for rel_path in prioritized_files[:10]: # Limit to top 10 key files to save context
-        full_path = os.path.join(repo_path, rel_path)
-        evidence["files_content"][rel_path] = read_file_content(full_path)
+    # Read content of key files (README and manifests); source code reaches the
+    # prompt through retrieval instead of a fixed list of entry point names.
+    # Shallowest first, so root manifests survive the cut in monorepos; then by path,
+    # so the same repository always yields the same evidence (stable prompt prefix)
+    selected = sorted(index_data["key_files"], key=lambda p: (p.count(os.sep), p))[:8] # Limit key files to save context
+    contents = read_files_content([os.path.join(repo_path, rel_path) for rel_path in selected])
+    for rel_path, content in zip(selected, contents.values()):
+        evidence["files_content"][rel_path] = content
+
+    if section_queries:
+        with metrics.span("retrieval_index"):
+            index = build_retrieval_index(repo_path, index_data["tree"])
+        evidence["section_evidence"] = {
+            section: [
+                {"path": chunk["path"], "lines": f"{chunk['start_line']}-{chunk['end_line']}", "text": chunk["text"]}
+                for _, chunk in index.search(query, RETRIEVAL_TOP_K)
+            ]
+            for section, query in section_queries.items()
+        }
         
     return evidence
+
+def build_retrieval_index(repo_path: str, tree: list) -> retrieval.BM25Index:
+    candidates = [f for f in tree if os.path.splitext(f)[1].lower() in SOURCE_EXTENSIONS][:MAX_RETRIEVAL_FILES]
+    samples = sample_files(
+        [os.path.join(repo_path, rel_path) for rel_path in candidates],
+        limit_lines=2000, max_bytes=RETRIEVAL_FILE_BYTES,
+    )
+    # Binary, minified, generated and unreadable files have nothing worth retrieving
+    files = {
+        rel_path: content
+        for rel_path, (content, skipped) in zip(candidates, samples.values())
+        if not skipped
+    }
+    metrics.record("files_retrievable", len(files))
+    return retrieval.build_index(files)
@@ -1,5 +1,5 @@
 import json
-from .ollama_client import generate_text
+from .ollama_client import generate
 
 SYSTEM_PROMPT = """
 You are an expert Senior Software Architect and Technical Writer.
@@ -9,19 +9,52 @@ Do NOT invent features that are not present. If you are unsure, state that it is
 Use a professional, technical tone.
 """
 
-USER_PROMPT_TEMPLATE = """
+# The evidence goes first and the instructions last, so that every prompt of a job
+# (and every re-run over the same evidence) starts with a byte-identical prefix that
+# Ollama can serve from its prompt cache instead of prefilling it again.
+EVIDENCE_PROMPT_TEMPLATE = """
 Here is the Evidence Package for the repository:
 {evidence_json}
+"""
+
+FIRST_SECTION_TEMPLATE = """
+The documentation is written one section at a time. Write ONLY the following section, starting with its heading:
+
+{section}
+"""
 
-Please generate the following documentation:
+NEXT_SECTION_TEMPLATE = """
+Using the same Evidence Package, write ONLY the next section, starting with its heading:
 
-# 1. Functional Requirements
-List the main features and functionalities based on the README and code structure.
+{section}
+"""
 
-# 2. Non-Functional Requirements
-Infer security, performance, scalability, and observability requirements based on the libraries and configurations found.
+SECTION_EXCERPTS_TEMPLATE = """
+Source excerpts retrieved for this section:
+{excerpts}
+"""
 
-# 3. Architecture (C4 & Principles)
+# Each section has its instructions and a retrieval query (see context_builder / retrieval.py)
+# selecting the source chunks that are most likely to answer it.
+SECTIONS = [
+    {
+        "key": "functional",
+        "query": "feature command endpoint route handler api request create update delete list upload user",
+        "prompt": """# 1. Functional Requirements
+List the main features and functionalities based on the README and code structure.""",
+    },
+    {
+        "key": "non_functional",
+        "query": "security auth authentication password hash token jwt encrypt permission cors "
+                 "cache performance pool async logging logger metrics monitoring retry timeout limit",
+        "prompt": """# 2. Non-Functional Requirements
+Infer security, performance, scalability, and observability requirements based on the libraries and configurations found.""",
+    },
+    {
+        "key": "architecture",
+        "query": "main app server router controller service model repository database session "
+                 "schema migration client queue worker entrypoint",
+        "prompt": """# 3. Architecture (C4 & Principles)
 - Describe the likely Architecture (MVC, Layered, Microservices).
 - Provide a Mermaid.js C4 Context diagram in a code block marked with `mermaid`.
   Example:
@@ -30,27 +63,66 @@ Infer security, performance, scalability, and observability requirements based o
     title System Context diagram for System
     ...
   ```
-- Provide a Mermaid.js C4 Container diagram in a code block marked with `mermaid`.
+- Provide a Mermaid.js C4 Container diagram in a code block marked with `mermaid`.""",
+    },
+    {
+        "key": "stack",
+        "query": "dependencies framework database driver orm docker build compile config settings environment",
+        "prompt": """# 4. Stack & Technologies
+List languages, frameworks, databases, and build tools detected.""",
+    },
+    {
+        "key": "summary",
+        "query": None, # The README and structure in the shared evidence are enough
+        "prompt": """# 5. Project Summary
+A brief executive summary of what the project does.""",
+    },
+]
 
-# 4. Stack & Technologies
-List languages, frameworks, databases, and build tools detected.
+SECTION_QUERIES = {section["key"]: section["query"] for section in SECTIONS if section["query"]}
 
-# 5. Project Summary
-A brief executive summary of what the project does.
+def build_evidence_prefix(evidence: dict) -> str:
+    """Canonical (key-sorted) rendering of the evidence, identical for identical evidence."""
+    # Per-section excerpts go with their own section prompt, not in the shared prefix
+    shared = {k: v for k, v in evidence.items() if k != "section_evidence"}
+    evidence_str = json.dumps(shared, indent=2, sort_keys=True)
+    return EVIDENCE_PROMPT_TEMPLATE.format(evidence_json=evidence_str)
 
-"""
+def build_section_prompt(section: dict, evidence: dict, template: str) -> str:
+    prompt = template.format(section=section["prompt"])
+    chunks = evidence.get("section_evidence", {}).get(section["key"])
+    if chunks:
+        excerpts = "\n".join(f"--- {c['path']} (lines {c['lines']})\n{c['text']}" for c in chunks)
+        prompt += SECTION_EXCERPTS_TEMPLATE.format(excerpts=excerpts)
+    return prompt
 
-async def generate_documentation(evidence: dict) -> str:
+async def generate_documentation(evidence: dict, flow=None) -> str:
     """
     Orchestrates the LLM generation.
+    `flow` is the fair-share key of this job's LLM calls (see ollama_client.AdmissionController).
+
+    The first section is prompted with the full evidence; each following section only
+    sends its instructions and retrieved excerpts and continues from the KV `context`
+    Ollama returned for the previous one, so the evidence is prefilled once per job.
+    A failed section raises (see ollama_client.generate), failing the job instead of
+    saving a partial document.
     """
-    evidence_str = json.dumps(evidence, indent=2)
-    
     # We might need to truncate if too large, but for now passing it all
     # A real world app would check token counts.
-    
-    prompt = USER_PROMPT_TEMPLATE.format(evidence_json=evidence_str)
-    
-    doc_markdown = await generate_text(prompt, SYSTEM_PROMPT)
-    
-    return doc_markdown
+    prefix = build_evidence_prefix(evidence)
+
+    parts = []
+    context = None
+    for i, section in enumerate(SECTIONS):
+        if context is None:
+            # First section, or the previous call returned no context: resend the evidence
+            template = FIRST_SECTION_TEMPLATE if i == 0 else NEXT_SECTION_TEMPLATE
+            prompt = prefix + build_section_prompt(section, evidence, template)
+        else:
+            prompt = build_section_prompt(section, evidence, NEXT_SECTION_TEMPLATE)
+
+        result = await generate(prompt, SYSTEM_PROMPT, flow=flow, context=context)
+        parts.append(result["response"].strip())
+        context = result["context"]
+
+    return "\n\n".join(parts)
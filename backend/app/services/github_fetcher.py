@@ -3,14 +3,73 @@ import shutil
 import os
 import zipfile
 from fastapi import HTTPException
+from . import metrics
 
-# In a real app, this should be configurable
-STORAGE_DIR = "storage/repos"
+# Where archives are downloaded from; overridden by the benchmarks to point at a local stand-in
+GITHUB_BASE_URL = os.getenv("GITHUB_BASE_URL", "https://github.com")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
 
-async def fetch_repo_zip(repo_url: str, job_id: str):
+# One pooled client shared by every download (single jobs and batches alike),
+# so concurrent fetches reuse TCP/TLS connections to GitHub.
+_client = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def parse_repo_full_name(url: str):
+    """
+    Extracts 'owner/repo' from https://github.com/owner/repo or just owner/repo.
+    Lowercased, as GitHub names are case-insensitive, so the same repository
+    always maps to the same full_name. Returns None if the identifiers cannot be found.
     """
-    Downloads the repository ZIP from GitHub and extracts it.
+    url = url.strip()
+    if "github.com/" in url:
+        parts = url.split("github.com/")[-1].split("/")
+    else:
+        parts = url.split("/")
+
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        return None
+
+    return f"{parts[0]}/{parts[1]}".replace(".git", "").lower()
+
+async def resolve_commit(full_name: str):
+    """
+    Returns the SHA of the default branch's HEAD commit, or None if GitHub can't tell us
+    (rate limit, network error). One small API call, much cheaper than the archive.
+    """
+    client = get_client()
+    try:
+        resp = await client.get(
+            f"{GITHUB_API_URL}/repos/{full_name}/commits/HEAD",
+            headers={"Accept": "application/vnd.github.sha"},
+            timeout=10.0,
+        )
+        resp.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    sha = resp.text.strip()
+    return sha if len(sha) == 40 else None
+
+async def fetch_repo_zip(repo_url: str, target_dir: str, ref: str = "HEAD"):
+    """
+    Downloads the repository ZIP from GitHub and extracts it into target_dir
+    (the job's workspace, see services/workspace.py).
     Assumes repo_url is https://github.com/owner/repo or similar.
+    `ref` may be a commit SHA (see resolve_commit) so the content matches exactly what was resolved.
     """
     if "github.com" not in repo_url:
         raise HTTPException(status_code=400, detail="Only GitHub repos are supported")
@@ -19,20 +78,21 @@ async def fetch_repo_zip(repo_url: str, job_id: str):
     # GitHub URL: https://github.com/owner/repo
     # Archive URL: https://github.com/owner/repo/archive/refs/heads/main.zip OR shorter: https://github.com/owner/repo/archive/HEAD.zip
     
-    zip_url = f"{repo_url}/archive/HEAD.zip"
-    target_dir = os.path.join(STORAGE_DIR, str(job_id))
+    zip_url = f"{GITHUB_BASE_URL}/{parse_repo_full_name(repo_url)}/archive/{ref}.zip"
     os.makedirs(target_dir, exist_ok=True)
     
     zip_path = os.path.join(target_dir, "repo.zip")
     
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        try:
-            resp = await client.get(zip_url)
-            resp.raise_for_status()
-            with open(zip_path, "wb") as f:
-                f.write(resp.content)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to download repo: {str(e)}")
+    client = get_client()
+    try:
+        resp = await client.get(zip_url)
+        resp.raise_for_status()
+        with open(zip_path, "wb") as f:
+            f.write(resp.content)
+        metrics.DOWNLOAD_BYTES.inc(len(resp.content))
+        metrics.record("download_bytes", len(resp.content))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to download repo: {str(e)}")
 
     # Extract ZIP
     try:
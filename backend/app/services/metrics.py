@@ -0,0 +1,173 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Per-job metrics dict of the pipeline currently running in this task (see track_job)
+_current_job = contextvars.ContextVar("current_job_metrics", default=None)
+
+_registry = []
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Counter:
+    """Monotonic counter, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Gauge:
+    """Value that can go up and down, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram, rendered in Prometheus text format."""
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {} # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+def render_latest() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Pipeline metrics ---
+
+JOBS_TOTAL = Counter("analysis_jobs_total", "Finished analysis jobs by final status.", ["status"])
+JOBS_COALESCED = Counter("analysis_jobs_coalesced_total", "Jobs that reused an identical in-flight analysis.")
+STAGE_SECONDS = Histogram("analysis_stage_seconds", "Wall time spent in each pipeline stage.", ["stage"])
+DOWNLOAD_BYTES = Counter("analysis_download_bytes_total", "Bytes of repository archives downloaded.")
+FILES_INDEXED = Counter("analysis_files_indexed_total", "Files walked by the repository indexer.")
+PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens evaluated by Ollama.")
+COMPLETION_TOKENS = Counter("llm_completion_tokens_total", "Completion tokens generated by Ollama.")
+TOKENS_PER_SECOND = Histogram(
+    "llm_completion_tokens_per_second", "Ollama generation speed (eval_count / eval_duration).",
+    buckets=(1, 2.5, 5, 10, 20, 40, 80, 160)
+)
+LLM_CONCURRENCY_LIMIT = Gauge("llm_concurrency_limit", "Current adaptive limit of concurrent Ollama requests.")
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "Ollama requests currently running.")
+LLM_QUEUE_DEPTH = Gauge("llm_queue_depth", "Ollama requests waiting for a slot.")
+LLM_RETRIES = Counter("llm_retries_total", "Ollama requests retried after a timeout or overload.")
+LLM_REJECTED = Counter("llm_rejected_total", "Ollama requests rejected by admission control.", ["reason"])
+WORKSPACE_BYTES = Gauge("workspace_bytes", "Bytes used under each storage folder after the last sweep.", ["area"])
+WORKSPACE_RECLAIMED_BYTES = Counter("workspace_reclaimed_bytes_total", "Bytes deleted from storage folders.", ["reason"])
+PDF_RENDER_SECONDS = Histogram("pdf_render_seconds", "Time to render a Markdown document to PDF.")
+
+@contextmanager
+def track_job(job_id: int):
+    """
+    Collects everything recorded by span()/record() inside the block into one dict,
+    which the pipeline stores with the job.
+    """
+    job_metrics = {"job_id": job_id, "stages": {}}
+    token = _current_job.set(job_metrics)
+    try:
+        yield job_metrics
+    finally:
+        _current_job.reset(token)
+
+@contextmanager
+def span(stage: str):
+    """Times a pipeline stage into STAGE_SECONDS and the current job's metrics."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        job_metrics = _current_job.get()
+        job_id = None
+        if job_metrics is not None:
+            job_id = job_metrics["job_id"]
+            stages = job_metrics["stages"]
+            stages[stage] = round(stages.get(stage, 0) + elapsed, 6)
+        logger.info("span stage=%s job=%s seconds=%.3f", stage, job_id, elapsed)
+
+def record(name: str, value: float):
+    """Adds `value` to a named total in the current job's metrics (no-op outside a job)."""
+    job_metrics = _current_job.get()
+    if job_metrics is not None:
+        job_metrics[name] = job_metrics.get(name, 0) + value
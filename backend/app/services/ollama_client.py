@@ -1,31 +1,288 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import random
+import time
 import httpx
 import json
+from . import metrics
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+logger = logging.getLogger(__name__)
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME = "qwen3" # Or "qwen:7b", user specified qwen3
 
-async def generate_text(prompt: str, system_prompt: str = "") -> str:
+# Admission control for the single Ollama instance: the number of concurrent prompts
+# starts at OLLAMA_MAX_CONCURRENCY and adapts (AIMD) between 1 and OLLAMA_CONCURRENCY_CAP.
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+OLLAMA_CONCURRENCY_CAP = int(os.getenv("OLLAMA_CONCURRENCY_CAP", "8"))
+# Outstanding jobs (accepted, not finished) above which new analyses are refused with 429
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "32"))
+OLLAMA_TARGET_LATENCY = float(os.getenv("OLLAMA_TARGET_LATENCY", "90"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Queue aging: waiting this long is worth one prompt of fair-share lag, so no flow
+# (a user's batches, or a stream of single jobs) can starve another one
+OLLAMA_AGING_SECONDS = float(os.getenv("OLLAMA_AGING_SECONDS", "30"))
+
+OLLAMA_REQUEST_TIMEOUT = 120.0 # Long timeout for LLM
+OLLAMA_DEADLINE = float(os.getenv("OLLAMA_DEADLINE", "900")) # queueing + retries of one prompt
+OLLAMA_MAX_RETRIES = 3
+OLLAMA_BACKOFF_BASE = 2.0
+OLLAMA_BACKOFF_MAX = 30.0
+
+class LLMOverloaded(Exception):
+    """The request was not admitted before its deadline passed."""
+
+    def __init__(self, retry_after: int, reason: str = "deadline"):
+        super().__init__(f"LLM is overloaded ({reason}), retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+class LLMTimeout(Exception):
+    """Ollama kept timing out until the retries or the deadline ran out."""
+
+class LLMUnavailable(Exception):
+    """Ollama could not be reached (not running, wrong OLLAMA_URL)."""
+
+class AdmissionController:
     """
-    Calls the local Ollama instance to generate text.
+    Admits Ollama requests up to an adaptive concurrency limit, sharing it fairly
+    between flows (start-time fair queueing). A flow is whatever should get one fair
+    share: all batch jobs of a user, or a single job. Each prompt gets the tag
+    max(virtual time, flow's previous tag + 1), so a flow that already sent many prompts
+    queues behind one that sent few, and a new flow starts at the current virtual time
+    instead of at 0 (no credit for having been idle). Waiting prompts also age: the
+    queue key is tag + arrival / OLLAMA_AGING_SECONDS, so a prompt never waits more than
+    about OLLAMA_AGING_SECONDS per prompt of lag behind prompts that arrive after it.
+
+    The limit follows AIMD: +1 per `limit` successful responses under the target
+    latency, halved on a timeout/error or a slow response (at most once per average
+    latency, so one burst of failures does not collapse it to the minimum).
+
+    Accepted work is never rejected here: prompts wait for a slot until their deadline.
+    Shedding happens before a job is accepted (see `is_saturated`), based on the jobs
+    still outstanding. Queued prompts are not added on top: each belongs to one of them.
+    """
+
+    def __init__(self, initial_limit: int, max_limit: int, max_queue: int, target_latency: float):
+        self.limit = float(max(1, initial_limit))
+        self.min_limit = 1.0
+        self.max_limit = float(max(max_limit, initial_limit))
+        self.max_queue = max_queue
+        self.target_latency = target_latency
+        self.active = 0
+        self.outstanding_jobs = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._avg_latency = target_latency / 2
+        self._last_decrease = 0.0
+        self._virtual_time = 0
+        self._flow_tags = {} # flow -> tag of its next prompt
+        self._publish()
+
+    def _publish(self):
+        metrics.LLM_CONCURRENCY_LIMIT.set(self.limit)
+        metrics.LLM_IN_FLIGHT.set(self.active)
+        metrics.LLM_QUEUE_DEPTH.set(len(self._waiters))
+
+    def job_started(self):
+        """An analysis was accepted: it will need the LLM until `job_finished`."""
+        self.outstanding_jobs += 1
+
+    def job_finished(self):
+        self.outstanding_jobs = max(0, self.outstanding_jobs - 1)
+
+    def is_saturated(self, new_jobs: int = 1) -> bool:
+        """True if accepting `new_jobs` more analyses would exceed the queue capacity."""
+        return self.outstanding_jobs + new_jobs > self.max_queue
+
+    def retry_after(self) -> int:
+        """Rough seconds until the current load drains."""
+        waves = (self.outstanding_jobs + 1) / max(int(self.limit), 1)
+        return max(1, math.ceil(waves * self._avg_latency))
+
+    def _tag(self, flow) -> int:
+        """Fair-share tag of the next prompt of `flow` (None: no fair-share state)."""
+        if flow is None:
+            return self._virtual_time
+        tag = max(self._virtual_time, self._flow_tags.get(flow, 0))
+        self._flow_tags[flow] = tag + 1
+        return tag
+
+    def _dispatched(self, tag: int):
+        self.active += 1
+        self._virtual_time = max(self._virtual_time, tag)
+        if len(self._flow_tags) > 4096:
+            # Flows at or behind the virtual time would restart from it anyway
+            self._flow_tags = {f: t for f, t in self._flow_tags.items() if t > self._virtual_time}
+
+    async def acquire(self, flow=None, deadline: float = None):
+        tag = self._tag(flow)
+        if self.active < int(self.limit) and not self._waiters:
+            self._dispatched(tag)
+            self._publish()
+            return
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        key = tag + loop.time() / OLLAMA_AGING_SECONDS
+        entry = [key, next(self._seq), fut, tag]
+        heapq.heappush(self._waiters, entry)
+        self._publish()
+
+        timeout = None if deadline is None else max(0.0, deadline - loop.time())
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed to us right before we gave up; pass it on.
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            self._publish()
+            if isinstance(exc, asyncio.TimeoutError):
+                metrics.LLM_REJECTED.inc(reason="deadline")
+                raise LLMOverloaded(self.retry_after(), reason="deadline") from None
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.active < int(self.limit):
+            _, _, fut, tag = heapq.heappop(self._waiters)
+            if not fut.done():
+                self._dispatched(tag)
+                fut.set_result(None)
+        self._publish()
+
+    def record(self, latency: float, ok: bool):
+        """Feeds one finished request into the latency average and the AIMD limit."""
+        self._avg_latency = 0.8 * self._avg_latency + 0.2 * latency
+        if not ok or latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_decrease > self._avg_latency:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._wake()
+        self._publish()
+
+scheduler = AdmissionController(
+    OLLAMA_MAX_CONCURRENCY, OLLAMA_CONCURRENCY_CAP, OLLAMA_MAX_QUEUE, OLLAMA_TARGET_LATENCY
+)
+
+# Pooled client shared by every prompt; timeouts are set per request
+_client = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(limits=httpx.Limits(max_connections=OLLAMA_CONCURRENCY_CAP * 2))
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _record_usage(result: dict):
+    """Token counters from Ollama's response (durations are in nanoseconds)."""
+    prompt_tokens = result.get("prompt_eval_count", 0)
+    completion_tokens = result.get("eval_count", 0)
+    eval_seconds = result.get("eval_duration", 0) / 1e9
+
+    metrics.PROMPT_TOKENS.inc(prompt_tokens)
+    metrics.COMPLETION_TOKENS.inc(completion_tokens)
+    metrics.record("prompt_tokens", prompt_tokens)
+    metrics.record("completion_tokens", completion_tokens)
+    metrics.record("prompt_eval_seconds", result.get("prompt_eval_duration", 0) / 1e9)
+    metrics.record("eval_seconds", eval_seconds)
+    if completion_tokens and eval_seconds > 0:
+        metrics.TOKENS_PER_SECOND.observe(completion_tokens / eval_seconds)
+
+async def generate(prompt: str, system_prompt: str = "", flow=None, context: list = None, deadline: float = None) -> dict:
+    """
+    Calls the local Ollama instance and returns {"response": str, "context": list | None}.
+    Passing the `context` of a previous call continues from its KV state, so Ollama only
+    prefills the new prompt instead of the whole conversation again.
+
+    Waits for admission (see AdmissionController) and retries timeouts with jittered
+    exponential backoff until `deadline` (event loop time, default now + OLLAMA_DEADLINE).
+    Raises LLMOverloaded if not admitted before the deadline, LLMTimeout once retries are
+    exhausted and LLMUnavailable if Ollama cannot be reached.
     """
     payload = {
         "model": MODEL_NAME,
         "prompt": prompt,
-        "system": system_prompt,
         "stream": False,
+        # Keep the model (and its prompt cache) loaded between the prompts of a job and across re-runs
+        "keep_alive": OLLAMA_KEEP_ALIVE,
         "options": {
             "temperature": 0.3, # Low temp for technical docs
             "top_p": 0.9,
             "num_predict": 4096 # Allow long output
         }
     }
-    
-    async with httpx.AsyncClient(timeout=120.0) as client: # Long timeout for LLM
+    if context:
+        # The system prompt is already part of the context
+        payload["context"] = context
+    else:
+        payload["system"] = system_prompt
+
+    loop = asyncio.get_running_loop()
+    if deadline is None:
+        deadline = loop.time() + OLLAMA_DEADLINE
+    client = get_client()
+
+    last_error = None
+    for attempt in range(OLLAMA_MAX_RETRIES + 1):
+        with metrics.span("llm_queue_wait"):
+            await scheduler.acquire(flow, deadline)
+        start = loop.time()
         try:
-            resp = await client.post(OLLAMA_URL, json=payload)
+            timeout = min(OLLAMA_REQUEST_TIMEOUT, max(1.0, deadline - start))
+            resp = await client.post(OLLAMA_URL, json=payload, timeout=timeout)
+            if resp.status_code == 503:
+                # Ollama sheds load with 503 when its own queue is full; treat like a timeout
+                raise httpx.HTTPStatusError("Ollama is overloaded", request=resp.request, response=resp)
             resp.raise_for_status()
             result = resp.json()
-            return result.get("response", "")
+        except (httpx.TimeoutException, httpx.HTTPStatusError) as e:
+            scheduler.record(loop.time() - start, ok=False)
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code != 503:
+                raise
+            last_error = e
         except httpx.RequestError as e:
-            print(f"Ollama connection error: {e}")
-            return "Error: Could not connect to Ollama. Make sure it is running."
+            scheduler.record(loop.time() - start, ok=False)
+            logger.error("Ollama connection error at %s: %s", OLLAMA_URL, e)
+            raise LLMUnavailable("Could not connect to Ollama. Make sure it is running.") from e
+        else:
+            scheduler.record(loop.time() - start, ok=True)
+            _record_usage(result)
+            return {"response": result.get("response", ""), "context": result.get("context")}
+        finally:
+            scheduler.release()
+
+        # Full jitter keeps the jobs that timed out together from retrying together
+        backoff = random.uniform(0, min(OLLAMA_BACKOFF_MAX, OLLAMA_BACKOFF_BASE * 2 ** attempt))
+        if attempt == OLLAMA_MAX_RETRIES or loop.time() + backoff >= deadline:
+            break
+        metrics.LLM_RETRIES.inc()
+        await asyncio.sleep(backoff)
+
+    raise LLMTimeout(f"Ollama did not answer after {attempt + 1} attempts: {last_error!r}")
+
+async def generate_text(prompt: str, system_prompt: str = "", flow=None) -> str:
+    """
+    Calls the local Ollama instance to generate text. Raises like `generate`.
+    """
+    result = await generate(prompt, system_prompt, flow=flow)
+    return result["response"]
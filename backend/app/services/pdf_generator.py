@@ -1,11 +1,20 @@
-import markdown
-from xhtml2pdf import pisa
 import os
 
+# markdown and xhtml2pdf (with reportlab) take most of the backend's import time,
+# so they are only imported when a PDF is rendered or preload() warms them up.
+
+def preload():
+    """Imports the PDF stack ahead of the first download (called off the event loop at startup)."""
+    import markdown
+    from xhtml2pdf import pisa
+
 def convert_md_to_pdf(md_content: str, output_path: str):
     """
     Converts Markdown content to PDF and saves it using xhtml2pdf.
     """
+    import markdown
+    from xhtml2pdf import pisa
+
     # Convert MD to HTML
     html_content = markdown.markdown(md_content, extensions=['fenced_code', 'tables'])
     
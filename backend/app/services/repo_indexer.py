@@ -1,4 +1,6 @@
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 # Directories to ignore
 IGNORE_DIRS = {
@@ -15,6 +17,25 @@ KEY_FILES = {
     "Makefile", "CMakeLists.txt"
 }
 
+# Sampling limits for read_file_content
+SAMPLE_HEAD_BYTES = 16 * 1024
+MAX_LINE_CHARS = 400
+MINIFIED_AVG_LINE = 300
+
+LOCK_FILES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock",
+    "Pipfile.lock", "uv.lock", "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum"
+}
+# Header forms that mark a whole file as generated, looked for in the first lines only:
+# "@generated" (Meta / protobuf tools) and Go's "// Code generated ... DO NOT EDIT."
+GENERATED_HEADER = re.compile(rb"@generated\b|^\s*(?://|#|/\*|\*|--)\s*Code generated .* DO NOT EDIT\.", re.MULTILINE)
+GENERATED_HEADER_LINES = 10
+# Documentation is never treated as generated, even if it talks about generated code
+PROSE_EXTENSIONS = {".md", ".txt", ".rst"}
+
+# Bytes that appear in text files (printable ASCII, common whitespace/control, and all of >= 0x80 for UTF-8)
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
 def index_repo(repo_path: str):
     """
     Walks the repo to generate a file tree and find key files.
@@ -56,16 +77,88 @@ def index_repo(repo_path: str):
         "root_path": repo_path
     }
 
-def read_file_content(full_path: str, limit_lines=100):
-    """Reads file content with a line limit to avoid huge files."""
-    content = []
+def _classify(sample: bytes, filename: str):
+    """
+    Cheap content sniffing on the first bytes of a file.
+    Returns "binary", "generated" or "minified", or None for ordinary text.
+    """
+    probe = sample[:8192]
+    if b"\0" in probe:
+        return "binary"
+    if probe and len(probe.translate(None, _TEXT_BYTES)) / len(probe) > 0.3:
+        return "binary"
+
+    if filename in LOCK_FILES:
+        return "generated"
+    if filename not in KEY_FILES and os.path.splitext(filename)[1].lower() not in PROSE_EXTENSIONS:
+        header = b"\n".join(probe[:2048].split(b"\n")[:GENERATED_HEADER_LINES])
+        if GENERATED_HEADER.search(header):
+            return "generated"
+
+    if ".min." in filename:
+        return "minified"
+    if len(probe) >= 2048 and len(probe) / (probe.count(b"\n") + 1) > MINIFIED_AVG_LINE:
+        return "minified"
+    return None
+
+def _decode_lines(data: bytes, drop_first: bool = False, drop_last: bool = False):
+    lines = data.decode("utf-8", errors="ignore").splitlines(keepends=True)
+    if drop_first and lines:
+        lines = lines[1:] # Partial line at the cut
+    if drop_last and lines:
+        lines = lines[:-1]
+    return [line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + " ...\n" for line in lines]
+
+def sample_file(full_path: str, limit_lines=100, max_bytes=SAMPLE_HEAD_BYTES, tail_bytes=0):
+    """
+    Reads a sample of the file: at most `limit_lines` lines from the first `max_bytes` bytes,
+    plus, if `tail_bytes` is set, the last lines of the file. Binary, minified and generated
+    files are detected from the first bytes and replaced by a one-line note.
+    Returns (content, skipped); `skipped` is True when content is such a note or a read error.
+    """
     try:
-        with open(full_path, "r", errors="ignore") as f:
-            for i, line in enumerate(f):
-                if i >= limit_lines:
-                    content.append(f"\n... (truncated after {limit_lines} lines)")
-                    break
-                content.append(line)
-        return "".join(content)
+        size = os.path.getsize(full_path)
+        with open(full_path, "rb") as f:
+            head = f.read(max_bytes)
+            tail = b""
+            if tail_bytes and size > max_bytes + tail_bytes:
+                f.seek(size - tail_bytes)
+                tail = f.read(tail_bytes)
     except Exception:
-        return "[Error reading file]"
+        return "[Error reading file]", True
+
+    kind = _classify(head, os.path.basename(full_path))
+    if kind:
+        return f"[Skipped {kind} file, {size} bytes]", True
+
+    byte_capped = size > len(head)
+    lines = _decode_lines(head, drop_last=byte_capped)
+    content = lines[:limit_lines]
+    if len(lines) > limit_lines:
+        content.append(f"\n... (truncated after {limit_lines} lines)")
+    elif byte_capped:
+        content.append(f"\n... (truncated after {max_bytes} bytes of {size})")
+
+    if tail:
+        tail_lines = _decode_lines(tail, drop_first=True)[-max(1, limit_lines // 4):]
+        content.append("\n... (last lines of the file)\n")
+        content.extend(tail_lines)
+
+    return "".join(content), False
+
+def read_file_content(full_path: str, limit_lines=100, **kwargs):
+    """Sample of the file as text (see sample_file)."""
+    return sample_file(full_path, limit_lines, **kwargs)[0]
+
+def sample_files(full_paths, limit_lines=100, max_workers=8, **kwargs):
+    """Samples many files concurrently (I/O bound, so threads overlap the waits). Returns {path: (content, skipped)}."""
+    if not full_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(full_paths))) as pool:
+        samples = pool.map(lambda path: sample_file(path, limit_lines, **kwargs), full_paths)
+        return dict(zip(full_paths, samples))
+
+def read_files_content(full_paths, limit_lines=100, max_workers=8, **kwargs):
+    """Reads many files concurrently. Returns {path: content}."""
+    samples = sample_files(full_paths, limit_lines, max_workers, **kwargs)
+    return {path: content for path, (content, _) in samples.items()}
@@ -0,0 +1,151 @@
+import hashlib
+import heapq
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# Chunking of source files for the index
+CHUNK_LINES = 40
+CHUNK_OVERLAP = 10
+MAX_CHUNK_CHARS = 1500
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Indexes kept in memory, keyed by the hash of the indexed content, up to an estimated
+# total size (one index of a large repository can take hundreds of MB)
+INDEX_CACHE_SIZE = 16
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Rough per-object costs used to estimate an index's memory footprint
+_CHUNK_OVERHEAD_BYTES = 400 # chunk dict, its keys and ints
+_POSTING_BYTES = 72 # (index, tf) tuple plus its list slot
+
+_IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "are", "not", "you", "return",
+    "self", "def", "var", "let", "const", "function", "import", "true", "false", "none", "null",
+}
+
+def tokenize(text: str):
+    """
+    Lowercased terms of `text`. Identifiers are indexed whole and split on camelCase and
+    snake_case, so `getUserToken` matches queries for "user" and "token".
+    """
+    terms = []
+    for word in _IDENTIFIER.findall(text):
+        parts = _CAMEL.findall(word)
+        lowered = word.lower()
+        if len(parts) > 1 and len(lowered) > 2 and lowered not in STOPWORDS:
+            terms.append(lowered)
+        for part in parts:
+            part = part.lower()
+            if len(part) > 2 and part not in STOPWORDS:
+                terms.append(part)
+    return terms
+
+def chunk_file(rel_path: str, text: str):
+    """Overlapping windows of CHUNK_LINES lines: [{"path", "start_line", "end_line", "text"}]."""
+    lines = text.splitlines()
+    chunks = []
+    step = CHUNK_LINES - CHUNK_OVERLAP
+    for start in range(0, max(len(lines), 1), step):
+        window = lines[start:start + CHUNK_LINES]
+        body = "\n".join(window).strip()
+        if body:
+            chunks.append({
+                "path": rel_path,
+                "start_line": start + 1,
+                "end_line": start + len(window),
+                "text": body[:MAX_CHUNK_CHARS],
+            })
+        if start + CHUNK_LINES >= len(lines):
+            break
+    return chunks
+
+class BM25Index:
+    """In-memory inverted index over chunks, scored with Okapi BM25."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.postings = {} # term -> [(chunk index, term frequency)]
+        self.lengths = []
+        for i, chunk in enumerate(chunks):
+            # The path is part of the document: "auth/jwt.py" is evidence for "auth" and "jwt"
+            terms = tokenize(chunk["path"]) + tokenize(chunk["text"])
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((i, tf))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        self.size_bytes = (
+            sum(len(chunk["text"]) + len(chunk["path"]) + _CHUNK_OVERHEAD_BYTES for chunk in chunks)
+            + sum(len(term) + 50 + _POSTING_BYTES * len(postings) for term, postings in self.postings.items())
+        )
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.chunks)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 4):
+        """Top-k chunks for `query` as [(score, chunk)], best first."""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for i, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(round(score, 3), self.chunks[i]) for i, score in best]
+
+# build_index runs in worker threads (asyncio.to_thread), so the cache is locked
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+def content_hash(files: dict) -> str:
+    digest = hashlib.sha256()
+    for rel_path in sorted(files):
+        digest.update(rel_path.encode())
+        digest.update(b"\0")
+        digest.update(files[rel_path].encode("utf-8", errors="ignore"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def build_index(files: dict) -> BM25Index:
+    """
+    Index for {rel_path: text}. Identical content (re-runs, the same commit analyzed
+    again) reuses the cached index instead of re-tokenizing every file.
+    """
+    global _cache_bytes
+    key = content_hash(files)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+
+    # Built outside the lock: two threads may build the same index, only one is kept
+    chunks = []
+    for rel_path in sorted(files):
+        chunks.extend(chunk_file(rel_path, files[rel_path]))
+    index = BM25Index(chunks)
+
+    if index.size_bytes > INDEX_CACHE_MAX_BYTES:
+        return index # Would evict everything else, don't cache it
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = index
+            _cache_bytes += index.size_bytes
+        while len(_cache) > INDEX_CACHE_SIZE or _cache_bytes > INDEX_CACHE_MAX_BYTES:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= evicted.size_bytes
+    return index
@@ -0,0 +1,48 @@
+import asyncio
+
+class Flight:
+    """One in-flight piece of work: the job running it and the future its followers await."""
+
+    def __init__(self, leader_id: int):
+        self.leader_id = leader_id
+        self.followers = 0
+        self.future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting when the leader fails; don't warn about an unretrieved exception
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def result(self):
+        self.followers += 1
+        # shield: a cancelled follower must not cancel the leader's result for everybody else
+        return await asyncio.shield(self.future)
+
+class SingleFlight:
+    """
+    Deduplicates identical concurrent work within this process: the first job for a key
+    (the leader) does the work, jobs arriving while it runs (followers) await its result.
+    Nothing is cached once the leader finishes.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    def get(self, key):
+        """The in-flight Flight for key, or None."""
+        return self._flights.get(key)
+
+    async def run(self, key, leader_id: int, work):
+        """Runs `await work()` as the leader for key and shares its outcome with followers."""
+        flight = Flight(leader_id)
+        self._flights[key] = flight
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            flight.future.set_exception(RuntimeError(f"Analysis #{leader_id} was cancelled"))
+            raise
+        except Exception as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from . import metrics
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, only this process's workspaces are protected
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Owns everything the backend writes to disk:
+# - storage/repos: per-job scratch space for the downloaded archive (removed when the job is done)
+# - storage/docs: rendered PDF reports (a cache, evicted by the sweeper)
+REPOS_DIR = "storage/repos"
+DOCS_DIR = "storage/docs"
+
+MB = 1024 * 1024
+
+# Optional tmpfs (e.g. /dev/shm/autodocgen) for job scratch space: extraction and
+# indexing never touch the disk, and a crash cannot leave gigabytes behind.
+WORKSPACE_TMPFS = os.getenv("WORKSPACE_TMPFS")
+REPOS_QUOTA_BYTES = int(os.getenv("REPOS_QUOTA_MB", "2048")) * MB
+DOCS_QUOTA_BYTES = int(os.getenv("DOCS_QUOTA_MB", "512")) * MB
+REPOS_MAX_AGE_SECONDS = int(os.getenv("REPOS_MAX_AGE_SECONDS", str(6 * 3600)))
+DOCS_MAX_AGE_SECONDS = int(os.getenv("DOCS_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+SWEEP_INTERVAL_SECONDS = int(os.getenv("SWEEP_INTERVAL_SECONDS", "300"))
+
+# Workspaces of jobs running in this process, never evicted by the sweeper
+_active = set()
+
+# Lock file inside each workspace, held (flock) by the job using it. Lets the sweeper of
+# any worker process tell a running job's workspace from one left behind by a crash.
+ACTIVE_LOCK_NAME = ".active.lock"
+
+def scratch_root() -> str:
+    return WORKSPACE_TMPFS or REPOS_DIR
+
+def _size_of(path: str) -> int:
+    if not os.path.isdir(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _open_workspace(path: str):
+    if os.path.exists(path):
+        _remove(path) # Leftover from a crashed run of the same job
+    os.makedirs(path)
+    lock = open(os.path.join(path, ACTIVE_LOCK_NAME), "w")
+    if fcntl:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+def _close_workspace(path: str, lock) -> int:
+    reclaimed = _size_of(path)
+    _remove(path)
+    lock.close() # Releases the flock, after the directory is gone
+    return reclaimed
+
+@asynccontextmanager
+async def job_workspace(job_id: int):
+    """
+    Scratch directory for one job, deleted (with everything in it) when the block exits.
+    Setup and teardown walk and delete whole extracted repositories, so they run in a
+    worker thread instead of blocking the event loop.
+    """
+    path = os.path.abspath(os.path.join(scratch_root(), str(job_id)))
+    lock = await asyncio.to_thread(_open_workspace, path)
+    _active.add(path)
+    try:
+        yield path
+    finally:
+        _active.discard(path)
+        reclaimed = await asyncio.to_thread(_close_workspace, path, lock)
+        metrics.WORKSPACE_RECLAIMED_BYTES.inc(reclaimed, reason="job_done")
+
+def _in_use(path: str) -> bool:
+    """True if a job (in any process) holds the workspace lock of `path`."""
+    if path in _active:
+        return True
+    if not fcntl or not os.path.isdir(path):
+        return False
+    try:
+        with open(os.path.join(path, ACTIVE_LOCK_NAME), "r") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    except FileNotFoundError:
+        return False # No lock file: a crashed job's leftovers
+    except OSError:
+        return True
+    return False
+
+def doc_path(filename: str) -> str:
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    return os.path.join(DOCS_DIR, filename)
+
+def touch(path: str):
+    """Marks a cached file as recently used, so quota eviction (oldest mtime first) keeps it."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def sweep(directory: str, quota_bytes: int, max_age_seconds: int) -> int:
+    """
+    Evicts entries of `directory` older than `max_age_seconds`, then the least recently
+    modified ones until the total fits in `quota_bytes`. Returns the bytes reclaimed.
+    """
+    if not os.path.isdir(directory):
+        return 0
+
+    now = time.time()
+    entries = []
+    for entry in os.scandir(directory):
+        path = os.path.abspath(entry.path)
+        if entry.name == "README.md" or _in_use(path):
+            continue
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        if entry.name.endswith(".tmp") and now - mtime <= max_age_seconds:
+            continue # A PDF being rendered right now
+        entries.append((mtime, path, _size_of(path)))
+    entries.sort()
+
+    total = sum(size for _, _, size in entries)
+    reclaimed = 0
+    for mtime, path, size in entries:
+        expired = now - mtime > max_age_seconds
+        if not expired and total <= quota_bytes:
+            break
+        _remove(path)
+        total -= size
+        reclaimed += size
+        metrics.WORKSPACE_RECLAIMED_BYTES.inc(size, reason="expired" if expired else "quota")
+
+    metrics.WORKSPACE_BYTES.set(total, area=directory)
+    if reclaimed:
+        logger.info("sweep dir=%s reclaimed_bytes=%d remaining_bytes=%d", directory, reclaimed, total)
+    return reclaimed
+
+def sweep_all() -> int:
+    reclaimed = sweep(scratch_root(), REPOS_QUOTA_BYTES, REPOS_MAX_AGE_SECONDS)
+    reclaimed += sweep(DOCS_DIR, DOCS_QUOTA_BYTES, DOCS_MAX_AGE_SECONDS)
+    return reclaimed
+
+async def run_sweeper(interval: int = SWEEP_INTERVAL_SECONDS):
+    """Background task: sweeps the storage folders every `interval` seconds, forever."""
+    while True:
+        try:
+            await asyncio.to_thread(sweep_all)
+        except Exception:
+            logger.exception("Workspace sweep failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,130 @@
+"""
+Import-time and cold-start benchmark for the backend.
+
+- import: wall time of `import app.main` in a fresh interpreter (median of --runs),
+  plus the slowest modules reported by `python -X importtime`.
+- cold start: time from spawning `uvicorn app.main:app` until GET /ready answers 200,
+  with a fresh database in a temporary folder.
+
+Usage, from the backend/ folder:
+
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from .run_benchmark import BACKEND_DIR, _free_port, _git_commit
+
+def _env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    env["SCHEMA_LOCK_PATH"] = os.path.join(workdir, ".schema.lock")
+    return env
+
+def measure_import(runs: int, workdir: str) -> float:
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", code], cwd=workdir, env=_env(workdir), text=True)
+        samples.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def slowest_imports(workdir: str, top: int):
+    """[(module, cumulative seconds)] from -X importtime, slowest first."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=workdir, env=_env(workdir), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+def measure_cold_start(timeout: float = 60.0) -> float:
+    """Cold start into its own empty folder, so every run creates the schema from scratch."""
+    with tempfile.TemporaryDirectory(prefix="autodocgen-startup-") as workdir:
+        return _cold_start(workdir, timeout)
+
+def _cold_start(workdir: str, timeout: float) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=_env(workdir),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.02)
+        raise RuntimeError("Backend did not become ready")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to report")
+    parser.add_argument("--output", help="Write the JSON result here")
+    parser.add_argument("--baseline", help="JSON result of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="autodocgen-startup-") as workdir:
+        import_seconds = measure_import(args.runs, workdir)
+        slowest = slowest_imports(workdir, args.top)
+    cold_starts = [measure_cold_start() for _ in range(args.runs)]
+
+    result = {
+        "commit": _git_commit(),
+        "import_seconds": round(import_seconds, 4),
+        "cold_start_seconds": round(statistics.median(cold_starts), 4),
+        "slowest_imports": [{"module": name, "seconds": round(s, 4)} for name, s in slowest],
+    }
+
+    print(f"commit {result['commit']}: import app.main {result['import_seconds']}s, "
+          f"cold start to /ready {result['cold_start_seconds']}s (median of {args.runs})")
+    for row in result["slowest_imports"]:
+        print(f"  {row['module']:<40}{row['seconds']:>10.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{key} {baseline[key]}s -> {result[key]}s"
+            for key in ("import_seconds", "cold_start_seconds")
+            if result[key] > baseline[key] * (1 + args.tolerance)
+        ]
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Local stand-ins for github.com and Ollama used by the benchmarks.
+
+Both are plain stdlib HTTP servers running in daemon threads, so a benchmark can
+exercise the real download, indexing and LLM code paths without any network.
+"""
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "service request user repository handler config database cache token "
+    "session module client server queue worker index model schema route"
+).split()
+
+@dataclass(frozen=True)
+class RepoShape:
+    files: int = 200            # source files per repository
+    file_size: int = 4000       # average bytes per source file
+    depth: int = 3              # directory nesting of the source tree
+    minified_files: int = 0     # single-line JS bundles (stress for the file sampler)
+    binary_files: int = 0       # random blobs with source-like names
+    seed: int = 0
+
+@dataclass(frozen=True)
+class OllamaProfile:
+    latency: float = 0.2            # fixed per-request overhead, seconds
+    tokens_per_second: float = 200  # generation speed
+    prefill_tokens_per_second: float = 4000
+    completion_tokens: int = 600
+
+def _source_file(rng: random.Random, size: int, ext: str) -> str:
+    lines = []
+    total = 0
+    while total < size:
+        if ext == ".py":
+            line = f"def {rng.choice(WORDS)}_{rng.choice(WORDS)}(x):  # {' '.join(rng.choices(WORDS, k=6))}\n"
+        else:
+            line = f"function {rng.choice(WORDS)}{rng.randint(0, 99)}(x) {{ return x; }} // {' '.join(rng.choices(WORDS, k=6))}\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)
+
+@lru_cache(maxsize=64)
+def build_repo_zip(full_name: str, shape: RepoShape) -> bytes:
+    """A GitHub-style archive (single top-level '<repo>-HEAD/' folder) of synthetic files."""
+    rng = random.Random(f"{shape.seed}:{full_name}")
+    root = f"{full_name.split('/')[-1]}-HEAD"
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{root}/README.md", f"# {full_name}\n\nA synthetic repository for benchmarking.\n")
+        zf.writestr(f"{root}/requirements.txt", "fastapi\nsqlalchemy\nhttpx\n")
+        zf.writestr(f"{root}/package.json", json.dumps({"name": full_name, "dependencies": {"express": "^4"}}))
+        zf.writestr(f"{root}/app/main.py", _source_file(rng, shape.file_size, ".py"))
+        for i in range(shape.files):
+            dirs = "/".join(rng.choice(WORDS) for _ in range(rng.randint(1, max(1, shape.depth))))
+            ext = rng.choice([".py", ".js"])
+            size = max(200, int(rng.gauss(shape.file_size, shape.file_size / 4)))
+            zf.writestr(f"{root}/src/{dirs}/file_{i}{ext}", _source_file(rng, size, ext))
+        for i in range(shape.minified_files):
+            body = ";".join(f"var a{j}=function(b){{return b*{j}}}" for j in range(shape.file_size // 8))
+            zf.writestr(f"{root}/dist_bundle/app.{i}.min.js", body)
+            zf.writestr(f"{root}/web{i}/index.js", body)
+        for i in range(shape.binary_files):
+            zf.writestr(f"{root}/assets/blob_{i}.py", rng.randbytes(shape.file_size))
+    return buf.getvalue()
+
+def _start(handler_cls) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+def start_fake_github(shape: RepoShape) -> ThreadingHTTPServer:
+    """
+    Serves GET /<owner>/<repo>/archive/<ref>.zip like github.com, and
+    GET /repos/<owner>/<repo>/commits/HEAD (sha media type) like api.github.com.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) == 5 and parts[0] == "repos" and parts[3] == "commits":
+                body = hashlib.sha1(f"{parts[1]}/{parts[2]}:{shape}".encode()).hexdigest().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if len(parts) != 4 or parts[2] != "archive" or not parts[3].endswith(".zip"):
+                self.send_error(404)
+                return
+            body = build_repo_zip(f"{parts[0]}/{parts[1]}", shape)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/zip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return _start(Handler)
+
+def start_fake_ollama(profile: OllamaProfile) -> ThreadingHTTPServer:
+    """
+    Serves POST /api/generate with Ollama's non-streaming response shape.
+    Latency = fixed overhead + prefill of new prompt tokens + generation; a request
+    carrying a `context` only pays prefill for its own prompt, like the real KV cache.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self.send_error(404)
+                return
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            prompt_tokens = len(payload.get("prompt", "")) // 4
+            if not payload.get("context"):
+                prompt_tokens += len(payload.get("system", "")) // 4
+            completion_tokens = profile.completion_tokens
+
+            prefill = prompt_tokens / profile.prefill_tokens_per_second
+            generation = completion_tokens / profile.tokens_per_second
+            time.sleep(profile.latency + prefill + generation)
+
+            context = list(payload.get("context") or []) + list(range(prompt_tokens + completion_tokens))
+            body = json.dumps({
+                "model": payload.get("model"),
+                "response": "## Section\n\n" + " ".join(WORDS[i % len(WORDS)] for i in range(completion_tokens)),
+                "done": True,
+                "context": context[-8192:],
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": completion_tokens,
+                "eval_duration": int(generation * 1e9),
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return _start(Handler)
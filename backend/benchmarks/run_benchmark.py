@@ -0,0 +1,240 @@
+"""
+End-to-end throughput benchmark for the backend.
+
+Runs the real FastAPI app (uvicorn in a subprocess) against local stand-ins for
+github.com and Ollama, drives it through the /repos and /analyses endpoints and
+reports jobs/min, per-stage latency percentiles (from /analyses/{id}/metrics) and
+the peak RSS of the backend process. Submissions rejected with 429 are retried
+after their Retry-After.
+
+Usage, from the backend/ folder:
+
+    python -m benchmarks.run_benchmark --jobs 20 --output bench.json
+    python -m benchmarks.run_benchmark --jobs 20 --baseline bench.json
+
+With --baseline, exits with status 1 if throughput drops or a stage p95 grows by
+more than --tolerance relative to the saved run, so regressions show up across commits.
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .fake_services import OllamaProfile, RepoShape, base_url, start_fake_github, start_fake_ollama
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _start_app(port: int, workdir: str, env: dict, timeout: float = 30.0) -> subprocess.Popen:
+    """Spawns the backend (cwd = workdir, where storage/ goes) and waits for GET /ready."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return proc
+        except httpx.TransportError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError("Backend exited during startup")
+        time.sleep(0.05)
+    proc.terminate()
+    proc.wait()
+    raise RuntimeError("Backend did not start")
+
+def _stop_app(proc: subprocess.Popen) -> float:
+    """Stops the backend and returns its peak RSS in MB."""
+    proc.terminate()
+    proc.wait()
+    # Max RSS over the reaped children, i.e. the backend (ru_maxrss is KiB on Linux)
+    return round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+def run(args) -> dict:
+    shape = RepoShape(
+        files=args.files, file_size=args.file_size, depth=args.depth,
+        minified_files=args.minified_files, binary_files=args.binary_files,
+    )
+    profile = OllamaProfile(
+        latency=args.ollama_latency, tokens_per_second=args.ollama_tps,
+        prefill_tokens_per_second=args.ollama_prefill_tps, completion_tokens=args.completion_tokens,
+    )
+    commit = _git_commit()
+    github = start_fake_github(shape)
+    ollama = start_fake_ollama(profile)
+
+    workdir = tempfile.mkdtemp(prefix="autodocgen-bench-")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env["SCHEMA_LOCK_PATH"] = os.path.join(workdir, ".schema.lock")
+    env["GITHUB_BASE_URL"] = base_url(github)
+    env["GITHUB_API_URL"] = base_url(github)
+    env["OLLAMA_URL"] = f"{base_url(ollama)}/api/generate"
+
+    port = _free_port()
+    server = _start_app(port, workdir, env)
+    try:
+        api = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60.0)
+
+        api.post("/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "bench"})
+        token = api.post("/auth/token", data={"username": "bench@example.com", "password": "bench"}).json()["access_token"]
+        api.headers["Authorization"] = f"Bearer {token}"
+
+        repo_ids = []
+        for i in range(args.jobs):
+            resp = api.post("/repos/", json={"url": f"https://github.com/bench/repo{i % args.distinct_repos}"})
+            resp.raise_for_status()
+            repo_ids.append(resp.json()["id"])
+
+        started = time.perf_counter()
+        job_ids = []
+        rejected = 0
+        for repo_id in repo_ids:
+            resp = api.post("/analyses/", params={"repository_id": repo_id})
+            while resp.status_code == 429:
+                # Shed by admission control: back off as told, like a well-behaved client
+                rejected += 1
+                time.sleep(float(resp.headers.get("Retry-After", "1")))
+                resp = api.post("/analyses/", params={"repository_id": repo_id})
+            resp.raise_for_status()
+            job_ids.append(resp.json()["id"])
+
+        pending = set(job_ids)
+        statuses = {}
+        deadline = time.time() + args.timeout
+        while pending and time.time() < deadline:
+            for job_id in list(pending):
+                status = api.get(f"/analyses/{job_id}").json()["status"]
+                if status in ("DONE", "ERROR"):
+                    statuses[job_id] = status
+                    pending.discard(job_id)
+            time.sleep(args.poll_interval)
+        elapsed = time.perf_counter() - started
+
+        stages = {}
+        for job_id in statuses:
+            job_metrics = api.get(f"/analyses/{job_id}/metrics").json()
+            for stage, seconds in job_metrics.get("stages", {}).items():
+                stages.setdefault(stage, []).append(seconds)
+    except BaseException:
+        _stop_app(server) # Don't leave the backend running if the benchmark fails
+        raise
+
+    peak_rss_mb = _stop_app(server)
+    github.shutdown()
+    ollama.shutdown()
+
+    done = sum(1 for s in statuses.values() if s == "DONE")
+    return {
+        "commit": commit,
+        "params": vars(args),
+        "jobs": args.jobs,
+        "done": done,
+        "errors": sum(1 for s in statuses.values() if s == "ERROR"),
+        "timed_out": len(pending),
+        "rejected_429": rejected,
+        "elapsed_seconds": round(elapsed, 3),
+        "jobs_per_min": round(done / elapsed * 60, 3) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb,
+        "stages": {
+            stage: {
+                "p50": round(percentile(values, 50), 4),
+                "p95": round(percentile(values, 95), 4),
+                "p99": round(percentile(values, 99), 4),
+                "max": round(max(values), 4),
+            }
+            for stage, values in sorted(stages.items())
+        },
+    }
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Human-readable list of regressions of `result` against `baseline`."""
+    regressions = []
+    if result["jobs_per_min"] < baseline["jobs_per_min"] * (1 - tolerance):
+        regressions.append(f"jobs/min {baseline['jobs_per_min']} -> {result['jobs_per_min']}")
+    for stage, stats in baseline.get("stages", {}).items():
+        current = result["stages"].get(stage)
+        # Ignore sub-10ms stages, their p95 is mostly noise
+        if current and stats["p95"] > 0.01 and current["p95"] > stats["p95"] * (1 + tolerance):
+            regressions.append(f"{stage} p95 {stats['p95']}s -> {current['p95']}s")
+    return regressions
+
+def print_report(result: dict):
+    print(f"commit {result['commit']}: {result['done']}/{result['jobs']} jobs done, "
+          f"{result['errors']} errors, {result['timed_out']} timed out, {result['rejected_429']} submissions retried after 429")
+    print(f"  {result['jobs_per_min']} jobs/min over {result['elapsed_seconds']}s, peak RSS {result['peak_rss_mb']} MB")
+    print(f"  {'stage':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for stage, s in result["stages"].items():
+        print(f"  {stage:<24}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['p99']:>10.3f}{s['max']:>10.3f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--distinct-repos", type=int, default=10, help="Jobs cycle over this many repositories")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--file-size", type=int, default=4000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--minified-files", type=int, default=0)
+    parser.add_argument("--binary-files", type=int, default=0)
+    parser.add_argument("--ollama-latency", type=float, default=0.2)
+    parser.add_argument("--ollama-tps", type=float, default=200.0)
+    parser.add_argument("--ollama-prefill-tps", type=float, default=4000.0)
+    parser.add_argument("--completion-tokens", type=int, default=600)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the JSON result here")
+    parser.add_argument("--baseline", help="JSON result of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    result = run(args)
+    print_report(result)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if baseline:
+        regressions = compare(result, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())